@@ -0,0 +1,39 @@
+-- Run in the Supabase SQL editor.
+-- Collapses the /stats endpoint's five separate PostgREST queries into a
+-- single RPC returning all counts plus the activity streak in one round-trip.
+
+CREATE OR REPLACE FUNCTION get_user_stats(uid uuid)
+RETURNS json
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT json_build_object(
+    'total_notes', (
+      SELECT count(*) FROM notes
+      WHERE user_id = uid AND NOT is_deleted
+    ),
+    'favorites_count', (
+      SELECT count(*) FROM notes
+      WHERE user_id = uid AND is_favorite AND NOT is_deleted
+    ),
+    'archived_count', (
+      SELECT count(*) FROM notes
+      WHERE user_id = uid AND is_archived AND NOT is_deleted
+    ),
+    'searches_this_week', (
+      SELECT count(*) FROM search_logs
+      WHERE user_id = uid AND created_at >= now() - interval '7 days'
+    ),
+    'streak', (
+      -- consecutive days with note activity, counted back from the most recent
+      WITH days AS (
+        SELECT DISTINCT created_at::date AS d FROM notes WHERE user_id = uid
+      ),
+      ranked AS (
+        SELECT d, row_number() OVER (ORDER BY d DESC) AS rn FROM days
+      )
+      SELECT count(*) FROM ranked
+      WHERE d = (SELECT max(d) FROM days) - (rn - 1)
+    )
+  );
+$$;
@@ -0,0 +1,26 @@
+-- Run in the Supabase SQL editor.
+-- Flips a note's favorite/archived flag server-side in one atomic statement,
+-- replacing the SELECT-then-UPDATE pattern (two round-trips plus a lost-update
+-- race under concurrent toggles). Returns NULL when the note doesn't exist.
+
+CREATE OR REPLACE FUNCTION toggle_favorite(nid uuid, uid uuid)
+RETURNS boolean
+LANGUAGE sql
+AS $$
+  UPDATE notes
+  SET is_favorite = NOT is_favorite,
+      updated_at = now()
+  WHERE id = nid AND user_id = uid
+  RETURNING is_favorite;
+$$;
+
+CREATE OR REPLACE FUNCTION toggle_archive(nid uuid, uid uuid)
+RETURNS boolean
+LANGUAGE sql
+AS $$
+  UPDATE notes
+  SET is_archived = NOT is_archived,
+      updated_at = now()
+  WHERE id = nid AND user_id = uid
+  RETURNING is_archived;
+$$;
@@ -0,0 +1,12 @@
+-- Run in the Supabase SQL editor.
+-- The text search in get_notes used ILIKE on both title and content, forcing
+-- a sequential scan over every note on each request. A stored tsvector column
+-- with a GIN index turns that into an index lookup.
+
+ALTER TABLE notes
+  ADD COLUMN search_tsv tsvector
+  GENERATED ALWAYS AS (
+    to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(content, ''))
+  ) STORED;
+
+CREATE INDEX notes_tsv_idx ON notes USING GIN (search_tsv);
@@ -0,0 +1,17 @@
+-- Run in the Supabase SQL editor.
+-- get_notes always filters on user_id plus one flag combination and orders by
+-- created_at DESC. These partial indexes match each filter_type branch so the
+-- query becomes an index walk in created_at order instead of a bitmap scan
+-- plus sort.
+
+CREATE INDEX notes_active_idx ON notes (user_id, created_at DESC)
+  WHERE NOT is_deleted AND NOT is_archived;
+
+CREATE INDEX notes_fav_idx ON notes (user_id, created_at DESC)
+  WHERE is_favorite AND NOT is_deleted;
+
+CREATE INDEX notes_arch_idx ON notes (user_id, created_at DESC)
+  WHERE is_archived AND NOT is_deleted;
+
+CREATE INDEX notes_trash_idx ON notes (user_id, created_at DESC)
+  WHERE is_deleted;
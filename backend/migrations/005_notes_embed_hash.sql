@@ -0,0 +1,6 @@
+-- Run in the Supabase SQL editor.
+-- Stores a hash of the text each note's vector was computed from, so updates
+-- that don't change the embedding input (tag/flag edits, no-op saves) can skip
+-- the OpenAI embedding call and Pinecone upsert entirely.
+
+ALTER TABLE notes ADD COLUMN embed_hash text;
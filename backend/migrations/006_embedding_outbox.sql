@@ -0,0 +1,18 @@
+-- Run in the Supabase SQL editor.
+-- Outbox for deferred Pinecone indexing: create_note commits the note and an
+-- outbox row in one transaction, and a background worker drains the outbox in
+-- batches (one embeddings call + one Pinecone upsert per batch). This keeps
+-- the create path to a single SQL write and removes the orphan-vector window
+-- where Pinecone had a note that Supabase didn't.
+
+-- attempts tracks failed embedding tries; rows that exhaust the worker's
+-- retry budget stay here for inspection but are skipped by the drainer.
+
+CREATE TABLE embedding_outbox (
+  note_id    uuid PRIMARY KEY,
+  title      text NOT NULL DEFAULT '',
+  content    text NOT NULL,
+  user_id    uuid NOT NULL,
+  created_at timestamptz NOT NULL DEFAULT now(),
+  attempts   int NOT NULL DEFAULT 0
+);